@@ -0,0 +1,932 @@
+"""Tkinter GUI for the persistent xAI chat.
+
+Renders the transcript in a native Text widget with tagged ranges;
+markdown in AI replies is reduced to styled plain text. API calls run on
+a worker thread and finished messages are handed to the Tk main loop
+through a queue.
+"""
+
+import asyncio
+import html
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from functools import partial
+from itertools import islice
+from datetime import datetime
+from pathlib import Path
+
+import tkinter as tk
+from tkinter import ttk, colorchooser, messagebox, scrolledtext
+
+# markdown, tkhtmlview and ttkthemes are imported where they are first
+# used: together they add a few hundred ms of cold start and none are
+# needed before the window is built.
+
+from persistent_chat import PersistentChat, SYSTEM_MESSAGE
+
+SETTINGS_FILE = "color_settings.json"
+
+try:
+    import orjson
+
+    def _settings_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    _settings_loads = orjson.loads
+except ImportError:  # same optional-dependency stance as the backend
+
+    def _settings_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=4).encode("utf-8")
+
+    _settings_loads = json.loads
+
+# Markdown output -> plain text for the Text widget: structural tags
+# become line breaks and bullets, everything else is stripped.
+_BR_RE = re.compile(r"<br\s*/?>")
+_LI_RE = re.compile(r"<li[^>]*>")
+_BLOCK_END_RE = re.compile(r"</(?:p|div|h[1-6]|ul|ol|pre|blockquote)>")
+_TAG_RE = re.compile(r"<[^>]+>")
+_MULTI_NL_RE = re.compile(r"\n{3,}")
+
+# Pulls the persona's display name out of the system prompt.
+_PERSONA_RE = re.compile(r"You are ([^,]+)")
+
+# Formatting-dialog preview, frozen at import; slider updates fill it
+# with one C-level format_map instead of rebuilding a large f-string.
+_PREVIEW_TMPL = (
+    '<div style="background-color: {BG_COLOR}; padding: 8px;">'
+    '<div style="margin: {message_spacing}px 0; '
+    "padding: 8px 12px; "
+    "background-color: {USER_MSG_BG}; "
+    'border-radius: 8px;">'
+    '<div style="font-family: {font_family}; '
+    "font-size: {font_size}px; "
+    "line-height: {line_spacing}em; "
+    "text-align: {text_align}; "
+    "color: {TEXT_COLOR}; "
+    "margin-left: {paragraph_indent}px; "
+    'text-indent: {first_line_indent}px;">'
+    "The quick brown fox jumps over the lazy dog. "
+    "Preview of the current message formatting settings."
+    "</div></div>"
+    '<div style="margin: {message_spacing}px 0; '
+    "padding: 8px 12px; "
+    "background-color: {AI_MSG_BG}; "
+    'border-radius: 8px;">'
+    '<div style="font-family: {font_family}; '
+    "font-size: {font_size}px; "
+    "line-height: {line_spacing}em; "
+    "text-align: {text_align}; "
+    'color: {TEXT_COLOR};">'
+    "And this is how an <b>AI reply</b> will look."
+    "</div></div></div>"
+)
+
+DEFAULT_COLORS = {
+    "BG_COLOR": "#1e1e2e",
+    "TEXT_COLOR": "#cdd6f4",
+    "ACCENT": "#89b4fa",
+    "USER_MSG_BG": "#313244",
+    "AI_MSG_BG": "#45475a",
+    "INPUT_BG": "#181825",
+    "BUTTON_BG": "#89b4fa",
+    "BUTTON_FG": "#1e1e2e",
+}
+
+DEFAULT_TEXT_SETTINGS = {
+    "font_family": "Segoe UI",
+    "font_size": 11,
+    "line_spacing": 1.4,
+    "message_spacing": 10,
+    "text_align": "left",
+    "paragraph_indent": 0,
+    "first_line_indent": 0,
+}
+
+
+class ChatGUI:
+    """Main application window."""
+
+    # Cap on messages kept in RAM for rendering. Entries evicted from
+    # the deque are not lost: every message is already appended to the
+    # backend's JSONL memory file, which is the spill-to-disk copy.
+    MAX_RENDERED_MESSAGES = 500
+
+    # How many of those are actually kept in the Text widget at a time.
+    # Appends are O(inserted bytes) either way; the window bounds widget
+    # memory and the cost of full rebuilds (refresh, eviction resync).
+    VISIBLE_WINDOW = 100
+
+    # Fixed attribute layout: drops the per-instance __dict__ and makes
+    # the attribute loads in the render/stream paths a little cheaper.
+    __slots__ = (
+        "root",
+        "colors",
+        "text_settings",
+        "_loop",
+        "chat",
+        "persona_name",
+        "_md",
+        "_markdown_cache",
+        "msg_queue",
+        "chat_history",
+        "_window_size",
+        "_widget_msg_count",
+        "should_autoscroll",
+        "_screen_size",
+        "chat_display",
+        "input_field",
+        "send_button",
+        "_style",
+        "_saved_colors",
+        "_text_settings_snapshot",
+        "_format_dialog_size",
+        "_turn_counter",
+    )
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Persistent Chat")
+
+        self.colors = self._load_color_settings()
+        self.text_settings = dict(DEFAULT_TEXT_SETTINGS)
+
+        # The async backend runs on its own event loop thread; Tk owns
+        # the main thread and coroutines are submitted cross-thread.
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="chat-io", daemon=True
+        ).start()
+
+        self.chat = PersistentChat()
+        # Warm the connection pool while the window is still assembling.
+        asyncio.run_coroutine_threadsafe(self.chat.prewarm(), self._loop)
+        match = _PERSONA_RE.search(SYSTEM_MESSAGE)
+        self.persona_name = match.group(1) if match else "AI"
+
+        # One converter for the session, built on first use so startup
+        # doesn't pay for markdown's extension registration; per-reply
+        # markdown.markdown() would also recompile its patterns.
+        self._md = None
+        # raw message text -> converted HTML. Color/format refreshes
+        # re-template every bubble; this keeps them from re-parsing the
+        # markdown too. Insertion-ordered, evicted oldest-first.
+        self._markdown_cache = {}
+
+        # Single producer (worker thread) / single consumer (Tk loop):
+        # deque append/popleft are atomic under CPython and skip the
+        # lock + condition machinery queue.Queue pays per operation.
+        self.msg_queue = deque()
+        self.chat_history = deque(maxlen=self.MAX_RENDERED_MESSAGES)
+        self._window_size = self.VISIBLE_WINDOW
+        # Messages currently present in the Text widget; when appends
+        # push it well past the window, one rebuild resyncs it.
+        self._widget_msg_count = 0
+        self.should_autoscroll = True
+        # Measured "WxH" geometry of the format dialog, cached on first
+        # open.
+        self._format_dialog_size = None
+        # Monotonic id per send; streaming partials carry it so
+        # overlapping turns never replace each other's bubbles.
+        self._turn_counter = 0
+
+        self._create_widgets()
+        self._configure_styles()
+        self._load_history_into_display()
+
+        self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
+        self.root.after(100, self.process_messages)
+
+    # ------------------------------------------------------------------
+    # Widget construction
+    # ------------------------------------------------------------------
+
+    def _create_widgets(self):
+        # Each winfo_* call is a Tcl round-trip; the screen does not
+        # change under us, so query it once and keep the result.
+        self._screen_size = (
+            self.root.winfo_screenwidth(),
+            self.root.winfo_screenheight(),
+        )
+        screen_w, screen_h = self._screen_size
+        width = min(900, int(screen_w * 0.6))
+        height = min(800, int(screen_h * 0.8))
+        x = (screen_w - width) // 2
+        y = (screen_h - height) // 2
+        self.root.geometry(f"{width}x{height}+{x}+{y}")
+        self.root.configure(bg=self.colors["BG_COLOR"])
+
+        main_frame = ttk.Frame(self.root, padding=8)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Native Text widget: inserting a message costs O(its bytes),
+        # where the HTML widget re-parsed the whole transcript per
+        # set_html. Styling is done with tags, configured once.
+        self.chat_display = scrolledtext.ScrolledText(
+            main_frame,
+            bg=self.colors["BG_COLOR"],
+            fg=self.colors["TEXT_COLOR"],
+            wrap=tk.WORD,
+            relief=tk.FLAT,
+            state=tk.DISABLED,
+            cursor="arrow",
+            padx=8,
+            pady=8,
+        )
+        self.chat_display.pack(fill=tk.BOTH, expand=True, pady=(0, 8))
+        self.chat_display.bind("<MouseWheel>", self._on_scroll)
+        self.chat_display.bind("<Button-4>", self._on_scroll)
+        self.chat_display.bind("<Button-5>", self._on_scroll)
+
+        input_frame = ttk.Frame(main_frame)
+        input_frame.pack(fill=tk.X)
+
+        self.input_field = tk.Text(
+            input_frame,
+            height=3,
+            bg=self.colors["INPUT_BG"],
+            fg=self.colors["TEXT_COLOR"],
+            insertbackground=self.colors["TEXT_COLOR"],
+            wrap=tk.WORD,
+            relief=tk.FLAT,
+        )
+        self.input_field.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 8))
+        self.input_field.bind("<Return>", self._on_return)
+        self.input_field.bind("<Shift-Return>", lambda e: None)
+        self.input_field.bind("<Control-c>", lambda e: self._copy_selected())
+        self.input_field.bind("<Control-v>", lambda e: self._paste_to_input())
+
+        self.send_button = ttk.Button(
+            input_frame, text="Send", style="Send.TButton", command=self._send_message
+        )
+        self.send_button.pack(side=tk.RIGHT, fill=tk.Y)
+
+        menubar = tk.Menu(self.root)
+        options = tk.Menu(menubar, tearoff=0)
+        options.add_command(label="Colors...", command=self._show_color_dialog)
+        options.add_command(label="Formatting...", command=self._show_format_dialog)
+        options.add_separator()
+        options.add_command(label="Clear chat", command=self._clear_chat)
+        menubar.add_cascade(label="Options", menu=options)
+        self.root.config(menu=menubar)
+
+    def _configure_styles(self):
+        # Reuse one Style handle; constructing ttk.Style() per call goes
+        # back through the Tcl interpreter every time.
+        if not hasattr(self, "_style"):
+            self._style = ttk.Style()
+        style = self._style
+        style.configure("TFrame", background=self.colors["BG_COLOR"])
+        style.configure(
+            "Send.TButton",
+            background=self.colors["BUTTON_BG"],
+            foreground=self.colors["BUTTON_FG"],
+            font=(self.text_settings["font_family"], 10, "bold"),
+        )
+        style.map(
+            "Send.TButton",
+            background=[("active", self.colors["ACCENT"])],
+        )
+        self._configure_tags()
+
+    def _configure_tags(self):
+        """(Re)configure the transcript tags from colors/text settings.
+
+        Tags restyle already-inserted text, so a color or format change
+        takes effect without touching the widget's contents.
+        """
+        w = self.chat_display
+        ts = self.text_settings
+        family = ts["font_family"]
+        size = ts["font_size"]
+        # line_spacing is an em multiplier in the settings; Text wants
+        # extra pixels between wrapped lines.
+        line_px = max(0, round(size * (ts["line_spacing"] - 1.0)))
+        justify = {"left": tk.LEFT, "center": tk.CENTER, "right": tk.RIGHT}.get(
+            ts["text_align"], tk.LEFT
+        )
+        body = dict(
+            font=(family, size),
+            foreground=self.colors["TEXT_COLOR"],
+            spacing2=line_px,
+            spacing3=ts["message_spacing"],
+            lmargin1=12 + ts["paragraph_indent"] + ts["first_line_indent"],
+            lmargin2=12 + ts["paragraph_indent"],
+            rmargin=12,
+            justify=justify,
+        )
+        w.tag_configure("user_body", background=self.colors["USER_MSG_BG"], **body)
+        w.tag_configure("ai_body", background=self.colors["AI_MSG_BG"], **body)
+        header = dict(
+            font=(family, max(size - 2, 7), "bold"),
+            foreground=self.colors["ACCENT"],
+            spacing1=ts["message_spacing"],
+            lmargin1=12,
+            lmargin2=12,
+        )
+        w.tag_configure("user_header", **header)
+        w.tag_configure("ai_header", **header)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def _insert_message(self, obj: dict):
+        """Append one message's tagged segments; widget must be NORMAL."""
+        w = self.chat_display
+        # Left-gravity mark at the message start, so a streaming update
+        # can delete-and-reinsert just this message.
+        w.mark_set("last_msg_start", "end-1c")
+        w.mark_gravity("last_msg_start", "left")
+        for text, tag in obj["segments"]:
+            w.insert("end", text, tag)
+
+    def _replace_last_message(self, obj: dict):
+        """Swap the most recently inserted message for a newer version."""
+        w = self.chat_display
+        w.delete("last_msg_start", "end")
+        for text, tag in obj["segments"]:
+            w.insert("end", text, tag)
+
+    def _render_full(self):
+        """Rebuild the widget from the visible tail of chat_history."""
+        w = self.chat_display
+        w.config(state=tk.NORMAL)
+        try:
+            w.delete("1.0", "end")
+            start = max(0, len(self.chat_history) - self._window_size)
+            count = 0
+            for obj in islice(self.chat_history, start, None):
+                self._insert_message(obj)
+                count += 1
+            self._widget_msg_count = count
+        finally:
+            w.config(state=tk.DISABLED)
+        if self.should_autoscroll:
+            w.see("end")
+
+    def _load_earlier_messages(self):
+        """Widen the visible window when the user scrolls to the top."""
+        if self._window_size >= len(self.chat_history):
+            return
+        old_size = self._window_size
+        self._window_size = min(
+            len(self.chat_history), self._window_size + self.VISIBLE_WINDOW
+        )
+        autoscroll = self.should_autoscroll
+        self.should_autoscroll = False
+        self._render_full()
+        self.should_autoscroll = autoscroll
+        # Keep the message the user was looking at roughly in place:
+        # the newly prepended block now occupies the top of the widget.
+        added = self._window_size - old_size
+        if added > 0:
+            self.chat_display.yview_moveto(added / self._window_size)
+
+    def _load_history_into_display(self):
+        for entry in self.chat.get_chat_history():
+            sender = self.persona_name if entry["role"] == "assistant" else "User"
+            ts = entry["timestamp"][11:19]
+            self.chat_history.append(
+                self._build_message_obj(sender, entry["content"], ts)
+            )
+        self._render_full()
+
+    # Poll fast while traffic is flowing, back off while idle.
+    POLL_ACTIVE_MS = 50
+    POLL_IDLE_MS = 200
+
+    def process_messages(self):
+        """Periodic fallback drain; real traffic arrives via _enqueue."""
+        active = self._flush_queue()
+        interval = self.POLL_ACTIVE_MS if active else self.POLL_IDLE_MS
+        self.root.after(interval, self.process_messages)
+
+    def _enqueue(self, obj):
+        """Queue a message object and wake the Tk consumer immediately.
+
+        after(0) from the producer makes delivery latency one event-loop
+        turn instead of up to a poll interval; the timer in
+        process_messages remains only as a safety net.
+        """
+        self.msg_queue.append(obj)
+        try:
+            self.root.after(0, self._flush_queue)
+        except (tk.TclError, RuntimeError):
+            pass  # window is being torn down
+
+    def _flush_queue(self) -> bool:
+        """Drain the queue and append whatever arrived to the display."""
+        q = self.msg_queue
+        msgs = []
+        while q:
+            msgs.append(q.popleft())
+        if msgs:
+            w = self.chat_display
+            w.config(state=tk.NORMAL)
+            needs_rebuild = False
+            try:
+                for obj in msgs:
+                    turn = obj.get("turn")
+                    last = self.chat_history[-1] if self.chat_history else None
+                    if (
+                        last is not None
+                        and last.get("partial")
+                        and turn is not None
+                        and turn == last.get("turn")
+                    ):
+                        # Streaming update: swap the growing reply in
+                        # place instead of appending a new message.
+                        self.chat_history[-1] = obj
+                        self._replace_last_message(obj)
+                        continue
+                    if turn is not None and self._update_turn_entry(obj, turn):
+                        # An overlapping turn pushed this stream off the
+                        # tail; its bubble was updated in history and
+                        # the widget resyncs with one rebuild below.
+                        needs_rebuild = True
+                        continue
+                    self.chat_history.append(obj)
+                    self._insert_message(obj)
+                    self._widget_msg_count += 1
+            finally:
+                w.config(state=tk.DISABLED)
+            if needs_rebuild:
+                self._render_full()
+            if self.should_autoscroll and self._window_size != self.VISIBLE_WINDOW:
+                # User came back to the bottom: collapse any widened
+                # window back to the normal size.
+                self._window_size = self.VISIBLE_WINDOW
+                self._render_full()
+            elif self._widget_msg_count > self._window_size + self.VISIBLE_WINDOW // 2:
+                # Appends outgrew the window by a comfortable slack:
+                # one rebuild drops the scrolled-off prefix.
+                self._render_full()
+            if self.should_autoscroll:
+                # One trailing scroll once Tk has relaid the new content;
+                # update() here would pump the whole event loop per batch.
+                self.root.after_idle(lambda: self.chat_display.see("end"))
+        return bool(msgs)
+
+    def _update_turn_entry(self, obj, turn) -> bool:
+        """Swap obj into the history entry of its own turn, if present.
+
+        Only the partial bubble still awaiting its stream may be
+        replaced. In-flight turns sit within a few entries of the tail,
+        so the backward scan is bounded rather than O(history).
+        """
+        hist = self.chat_history
+        for back, entry in enumerate(reversed(hist)):
+            if back >= 8:
+                break
+            if entry.get("turn") == turn and entry.get("partial"):
+                hist[len(hist) - 1 - back] = obj
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Messages
+    # ------------------------------------------------------------------
+
+    # Entries kept in the markdown cache; enough for a full render
+    # window of distinct AI replies.
+    MARKDOWN_CACHE_SIZE = 256
+
+    def _convert_markdown(self, message: str) -> str:
+        cached = self._markdown_cache.get(message)
+        if cached is not None:
+            return cached
+        if self._md is None:
+            import markdown
+
+            self._md = markdown.Markdown(output_format="html5")
+        converted = self._md.reset().convert(message)
+        if len(self._markdown_cache) >= self.MARKDOWN_CACHE_SIZE:
+            del self._markdown_cache[next(iter(self._markdown_cache))]
+        self._markdown_cache[message] = converted
+        return converted
+
+    def _md_to_text(self, message: str) -> str:
+        """Reduce markdown to plain text with minimal structure.
+
+        The Text widget renders characters, not markup, so the converted
+        HTML is flattened: block ends become newlines, list items become
+        bullets, remaining tags are stripped and entities unescaped.
+        """
+        converted = self._convert_markdown(message)
+        converted = _BR_RE.sub("\n", converted)
+        converted = _LI_RE.sub("• ", converted)
+        converted = _BLOCK_END_RE.sub("\n", converted)
+        text = html.unescape(_TAG_RE.sub("", converted))
+        return _MULTI_NL_RE.sub("\n\n", text).strip("\n")
+
+    def _build_message_obj(self, sender: str, message: str, timestamp: str) -> dict:
+        # Plain text needs no escaping or emoji span wrapping in a Text
+        # widget; Tk draws the characters directly.
+        body = message if sender == "User" else self._md_to_text(message)
+        role = "user" if sender == "User" else "ai"
+        # No copy of the raw text here: the backend's memory file owns
+        # it, and keeping both roughly doubled per-entry footprint.
+        return {
+            "sender": sender,
+            "timestamp": timestamp,
+            # Ready-to-insert (text, tag) pairs; built off the Tk thread.
+            "segments": [
+                (f"[{timestamp}] {sender}\n", f"{role}_header"),
+                (body.rstrip("\n") + "\n\n", f"{role}_body"),
+            ],
+        }
+
+    def _add_message(self, sender: str, message: str):
+        """Format a message and hand it to the render queue.
+
+        Safe to call from any thread: _build_message_obj is pure string
+        work (markdown included) and the deque is the thread boundary.
+        Tk widgets are only touched in _flush_queue on the main loop.
+        """
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self._enqueue(self._build_message_obj(sender, message, timestamp))
+
+    def _on_return(self, event):
+        if not event.state & 0x1:  # plain Return, not Shift-Return
+            self._send_message()
+            return "break"
+
+    def _send_message(self):
+        message = self.input_field.get("1.0", tk.END).strip()
+        if not message:
+            return
+        self.input_field.delete("1.0", tk.END)
+        # Formatting work runs on the I/O loop thread, same as AI
+        # replies; the Tk thread only ever inserts finished segments.
+        self._loop.call_soon_threadsafe(self._add_message, "User", message)
+        self.root.title(f"Persistent Chat - {self.persona_name} is thinking...")
+        self._turn_counter += 1
+        asyncio.run_coroutine_threadsafe(
+            self._process_message(message, self._turn_counter), self._loop
+        )
+
+    # Minimum interval between partial-reply pushes while streaming;
+    # a completed line goes out immediately regardless.
+    STREAM_UPDATE_S = 0.03
+
+    async def _process_message(self, message: str, turn: int):
+        try:
+            started = datetime.now().strftime("%H:%M:%S")
+            last_push = 0.0
+            last_len = 0
+
+            def on_delta(text):
+                nonlocal last_push, last_len
+                now = time.monotonic()
+                # Newlines are cheap progress cues (a finished paragraph
+                # or list item); don't make them wait out the throttle.
+                if (
+                    now - last_push < self.STREAM_UPDATE_S
+                    and "\n" not in text[last_len:]
+                ):
+                    return
+                last_push = now
+                last_len = len(text)
+                obj = self._build_message_obj(self.persona_name, text, started)
+                obj["partial"] = True
+                obj["turn"] = turn
+                self._enqueue(obj)
+
+            response = await self.chat.chat(message, on_delta=on_delta)
+            # Convert markdown here on the worker thread; the main loop
+            # only has to insert the finished HTML fragment.
+            final = self._build_message_obj(self.persona_name, response, started)
+            final["turn"] = turn  # replaces this turn's partial bubble
+            self._enqueue(final)
+        except Exception as e:
+            self._add_message("System", f"Error: {e}")
+        finally:
+            self.root.after(0, lambda: self.root.title("Persistent Chat"))
+
+    # ------------------------------------------------------------------
+    # Scrolling
+    # ------------------------------------------------------------------
+
+    def _on_scroll(self, event=None):
+        """Track autoscroll from wheel direction, probing yview lazily.
+
+        Scrolling up always leaves the bottom, so that case needs no
+        query; scrolling down only probes while autoscroll is off, and
+        latches it back on once the view reaches the bottom.
+        """
+        up = getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0
+        try:
+            if up:
+                self.should_autoscroll = False
+                # Only an upward scroll can hit the top of the window.
+                if self.chat_display.yview()[0] < 0.01:
+                    self._load_earlier_messages()
+            elif not self.should_autoscroll:
+                self.should_autoscroll = self.chat_display.yview()[1] >= 0.99
+        except tk.TclError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Clipboard
+    # ------------------------------------------------------------------
+
+    def _copy_selected(self):
+        # Tk's own clipboard is in-process; pyperclip shells out to
+        # xclip/pbcopy on some platforms, a visible pause per Ctrl+C.
+        try:
+            selection = self.root.selection_get()
+            self.root.clipboard_clear()
+            self.root.clipboard_append(selection)
+            self.root.update_idletasks()
+        except tk.TclError:
+            pass  # nothing selected
+        return "break"
+
+    def _paste_to_input(self):
+        try:
+            self.input_field.insert(tk.INSERT, self.root.clipboard_get())
+        except tk.TclError:
+            pass  # clipboard empty or non-text
+        return "break"
+
+    # ------------------------------------------------------------------
+    # Chat management
+    # ------------------------------------------------------------------
+
+    def _clear_chat(self):
+        if not messagebox.askyesno("Clear chat", "Clear the conversation and memory?"):
+            return
+        # Run on the I/O loop like every other backend call: clearing
+        # takes the backend's history lock so it cannot race an
+        # in-flight turn's bookkeeping. Block briefly for the result so
+        # the rerender below reflects the cleared state.
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self.chat.clear_memory(), self._loop
+            ).result(timeout=5)
+        except Exception as e:
+            messagebox.showerror("Clear chat", f"Could not clear memory: {e}")
+            return
+        self.chat_history.clear()
+        self._render_full()
+
+    def _refresh_messages(self):
+        """Re-render after a color/format change.
+
+        The message segments themselves carry no styling — tags do — so
+        this is a tag reconfiguration plus one rebuild of the window.
+        """
+        self._configure_tags()
+        self._render_full()
+
+    # ------------------------------------------------------------------
+    # Color settings
+    # ------------------------------------------------------------------
+
+    def _load_color_settings(self) -> dict:
+        settings_path = Path(SETTINGS_FILE)
+        if settings_path.exists():
+            try:
+                saved = _settings_loads(settings_path.read_bytes())
+                colors = dict(DEFAULT_COLORS)
+                colors.update(saved.get("colors", {}))
+                self._saved_colors = dict(colors)
+                return colors
+            except (ValueError, OSError):
+                pass
+        self._saved_colors = None  # nothing on disk yet
+        return dict(DEFAULT_COLORS)
+
+    def _save_color_settings(self):
+        if self.colors == self._saved_colors:
+            return  # nothing changed since the last write
+        try:
+            # Temp file + rename so a crash mid-write can't leave a
+            # truncated settings file behind.
+            tmp = SETTINGS_FILE + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_settings_dumps({"colors": self.colors}))
+            os.replace(tmp, SETTINGS_FILE)
+            self._saved_colors = dict(self.colors)
+        except OSError:
+            pass
+
+    def _show_color_dialog(self):
+        for key, label in (
+            ("BG_COLOR", "Background"),
+            ("TEXT_COLOR", "Text"),
+            ("USER_MSG_BG", "User message background"),
+            ("AI_MSG_BG", "AI message background"),
+        ):
+            result = colorchooser.askcolor(
+                color=self.colors[key], title=f"Choose {label} color"
+            )
+            if result and result[1]:
+                self.colors[key] = result[1]
+        self._update_colors()
+
+    def _update_colors(self):
+        # Tags restyle text that is already in the widget, so a color
+        # change is pure reconfiguration — the transcript is not
+        # rebuilt. All configure calls land before the single idle-task
+        # flush, so the repaint happens once.
+        self._configure_styles()
+        self.root.configure(bg=self.colors["BG_COLOR"])
+        self.chat_display.configure(
+            bg=self.colors["BG_COLOR"], fg=self.colors["TEXT_COLOR"]
+        )
+        self.input_field.configure(
+            bg=self.colors["INPUT_BG"], fg=self.colors["TEXT_COLOR"]
+        )
+        self.root.update_idletasks()
+        self._save_color_settings()
+
+    # ------------------------------------------------------------------
+    # Formatting dialog
+    # ------------------------------------------------------------------
+
+    def _format_preview_text(self) -> str:
+        return _PREVIEW_TMPL.format_map({**self.colors, **self.text_settings})
+
+    # Settings whose effect is fully expressed through tag options; a
+    # change confined to these restyles in place. Anything outside the
+    # set (a future setting that alters the inserted text itself) forces
+    # a rebuild.
+    _STYLE_ONLY_SETTINGS = frozenset(
+        {
+            "font_family",
+            "font_size",
+            "line_spacing",
+            "message_spacing",
+            "text_align",
+            "paragraph_indent",
+            "first_line_indent",
+        }
+    )
+
+    def _show_format_dialog(self):
+        # Snapshot for the Apply-time diff against live slider edits.
+        self._text_settings_snapshot = dict(self.text_settings)
+        format_dialog = tk.Toplevel(self.root)
+        format_dialog.title("Message formatting")
+        format_dialog.transient(self.root)
+        format_dialog.configure(bg=self.colors["BG_COLOR"])
+        # Closing the window is a cancel too: the preview writes slider
+        # values straight into text_settings, so they must be rolled
+        # back unless Apply commits them.
+        format_dialog.protocol(
+            "WM_DELETE_WINDOW",
+            partial(self._cancel_format_settings, format_dialog),
+        )
+
+        main_frame = ttk.Frame(format_dialog, padding=12)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        from tkhtmlview import HTMLLabel
+
+        preview_text = HTMLLabel(
+            main_frame,
+            html=self._format_preview_text(),
+            background=self.colors["BG_COLOR"],
+        )
+
+        # A scale drag fires its command per pixel of travel; re-parsing
+        # the preview HTML at that rate stutters. Coalesce: one pending
+        # idle job at a time, rendering the latest slider values once
+        # the event burst has been processed.
+        preview_job = None
+        # tkhtmlview offers no CSS-variable or style-mutation hook:
+        # set_html always re-parses the whole document. The smallest
+        # delta available is none at all — the scales fire per pixel of
+        # travel but the rounded values change far less often, so skip
+        # renders whose effective values match the last one shown.
+        last_rendered = None
+
+        def do_update():
+            nonlocal preview_job, last_rendered
+            preview_job = None
+            values = (
+                int(font_size.get()),
+                round(line_spacing.get(), 1),
+                int(message_spacing.get()),
+            )
+            if values == last_rendered:
+                return
+            last_rendered = values
+            ts = self.text_settings
+            ts["font_size"], ts["line_spacing"], ts["message_spacing"] = values
+            preview_text.set_html(self._format_preview_text())
+
+        def update_preview(*args):
+            nonlocal preview_job
+            if preview_job is not None:
+                return
+            preview_job = format_dialog.after_idle(do_update)
+
+        row = 0
+        ttk.Label(main_frame, text="Font size").grid(row=row, column=0, sticky=tk.W)
+        font_size = ttk.Scale(
+            main_frame, from_=8, to=24, value=self.text_settings["font_size"],
+            command=update_preview,
+        )
+        font_size.grid(row=row, column=1, sticky=tk.EW, padx=8)
+        row += 1
+
+        ttk.Label(main_frame, text="Line spacing").grid(row=row, column=0, sticky=tk.W)
+        line_spacing = ttk.Scale(
+            main_frame, from_=1.0, to=2.5, value=self.text_settings["line_spacing"],
+            command=update_preview,
+        )
+        line_spacing.grid(row=row, column=1, sticky=tk.EW, padx=8)
+        row += 1
+
+        ttk.Label(main_frame, text="Message spacing").grid(row=row, column=0, sticky=tk.W)
+        message_spacing = ttk.Scale(
+            main_frame, from_=0, to=30, value=self.text_settings["message_spacing"],
+            command=update_preview,
+        )
+        message_spacing.grid(row=row, column=1, sticky=tk.EW, padx=8)
+        row += 1
+
+        preview_text.grid(row=row, column=0, columnspan=2, sticky=tk.NSEW, pady=8)
+        main_frame.rowconfigure(row, weight=1)
+        main_frame.columnconfigure(1, weight=1)
+        row += 1
+
+        button_frame = ttk.Frame(main_frame)
+        button_frame.grid(row=row, column=0, columnspan=2, sticky=tk.E)
+        ttk.Button(
+            button_frame, text="Apply",
+            command=partial(self._apply_format_settings, format_dialog),
+        ).pack(side=tk.LEFT, padx=4)
+        ttk.Button(
+            button_frame, text="Cancel",
+            command=partial(self._cancel_format_settings, format_dialog),
+        ).pack(side=tk.LEFT)
+
+        # The dialog's requested size only depends on its fixed layout,
+        # so the update_idletasks/winfo_req* measurement (a full
+        # geometry pass) is paid once and reused on every reopen.
+        if self._format_dialog_size is None:
+            format_dialog.update_idletasks()
+            width = main_frame.winfo_reqwidth() + 40
+            height = main_frame.winfo_reqheight() + 40
+            self._format_dialog_size = f"{width}x{height}"
+        format_dialog.geometry(self._format_dialog_size)
+
+    def _restyle_messages(self):
+        """Apply new settings to the existing transcript via tags only."""
+        self._configure_tags()
+        self.root.update_idletasks()
+
+    def _apply_format_settings(self, dialog):
+        snapshot = self._text_settings_snapshot
+        changed = {
+            k for k, v in self.text_settings.items() if snapshot.get(k) != v
+        }
+        if changed <= self._STYLE_ONLY_SETTINGS:
+            # Tag reconfiguration restyles in place: O(1) in messages.
+            self._restyle_messages()
+        else:
+            self._refresh_messages()
+        self._save_color_settings()
+        dialog.destroy()
+
+    def _cancel_format_settings(self, dialog):
+        # do_update wrote the live slider values into text_settings for
+        # the preview; abandoning the dialog must not leave them to
+        # take effect on the next _configure_tags run.
+        self.text_settings.update(self._text_settings_snapshot)
+        dialog.destroy()
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+
+    def _on_closing(self):
+        self._save_color_settings()
+        try:
+            asyncio.run_coroutine_threadsafe(
+                self.chat.aclose(), self._loop
+            ).result(timeout=2)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.root.destroy()
+
+
+def main():
+    from ttkthemes import ThemedTk
+
+    root = ThemedTk(theme="equilux")
+    ChatGUI(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
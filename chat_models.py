@@ -0,0 +1,51 @@
+"""Pydantic schemas shared by the chat client.
+
+Kept in their own module so persistent_chat can defer importing
+pydantic (a few hundred ms of cold-start cost) until a chat session is
+actually constructed.
+"""
+
+import time
+from typing import List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+
+class PersonaConfig(BaseModel):
+    """Schema for ai_persona.json."""
+
+    name: str
+    personality: str
+    speaking_style: str
+    interests: List[str] = []
+
+
+class Message(BaseModel):
+    """A single chat message.
+
+    The timestamp is a plain time.time() float; datetime objects are
+    only materialized for display, so bulk loads never construct them.
+    Frozen with no extra fields: instances are immutable records, and
+    the Literal role validates against a small lookup rather than a
+    generic str check.
+    """
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    role: Literal["user", "assistant", "system"]
+    content: str
+    ts: float = Field(default_factory=time.time)
+
+
+class ChatMemory(BaseModel):
+    """Everything we persist between sessions."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    messages: List[Message] = []
+    metadata: dict = {}
+
+
+# One adapter for bulk message work: a single validate_python call runs
+# entirely inside pydantic-core instead of N Python-level constructions.
+MESSAGES_ADAPTER = TypeAdapter(List[Message])
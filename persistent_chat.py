@@ -0,0 +1,834 @@
+"""Persistent chat client for the xAI API.
+
+Keeps the full conversation on disk (chat_memory.json) so the AI retains
+context between sessions, and loads its persona from ai_persona.json.
+Run directly for a simple REPL, or use `ChatGUI` in chat_gui.py.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import logging
+import functools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+# httpx and the pydantic models (chat_models) are imported lazily via
+# _lazy_imports(): the non-interactive exit path in main() never touches
+# them, and together they dominate cold-start import time.
+
+try:
+    import orjson
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+    def _json_dumps_compact(obj) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:  # orjson is optional; stdlib json works, just slower
+
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+    def _json_dumps_compact(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+XAI_API_BASE = "https://api.x.ai/v1"
+MODEL_NAME = "grok-beta"
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # seconds; doubles per attempt before jitter
+BACKOFF_CAP = 30.0
+
+# Most recent messages sent as context per request. The full history
+# stays on disk; without a cap the payload (and token cost) grows with
+# every turn of a long-running session.
+MAX_CONTEXT_MSGS = 40
+
+MEMORY_FILE = "chat_memory.jsonl"
+LEGACY_MEMORY_FILE = "chat_memory.json"
+PERSONA_FILE = "ai_persona.json"
+
+# How often appended messages are forced to disk. Between fsyncs a crash
+# can lose at most FSYNC_EVERY messages of the tail.
+FSYNC_EVERY = 20
+LOG_DIR = Path("logs")
+
+logger = logging.getLogger(__name__)
+
+_LOGGING_CONFIGURED = False
+_LAZY_IMPORTED = False
+
+
+def _configure_logging() -> None:
+    """Open the session log file. Deferred off the import path so merely
+    importing the module doesn't create a log per process."""
+    global _LOGGING_CONFIGURED
+    if _LOGGING_CONFIGURED:
+        return
+    LOG_DIR.mkdir(exist_ok=True)
+    logging.basicConfig(
+        level=os.environ.get("CHAT_LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[
+            logging.FileHandler(
+                LOG_DIR / datetime.now().strftime("chat_debug_%Y%m%d_%H%M%S.log"),
+                encoding="utf-8",
+            ),
+            logging.StreamHandler(),
+        ],
+    )
+    _LOGGING_CONFIGURED = True
+
+
+def _lazy_imports() -> None:
+    """Bind httpx and the chat_models schemas into module globals.
+
+    Deferred so the non-interactive bail-out in main() never pays the
+    ~100-300ms these imports cost on a cold start. The global-rebind
+    means every existing call site works unchanged after the first call.
+    """
+    global _LAZY_IMPORTED, httpx, Message, ChatMemory, PersonaConfig
+    global MESSAGES_ADAPTER
+    if _LAZY_IMPORTED:
+        return
+    import httpx
+    from chat_models import (
+        ChatMemory,
+        Message,
+        MESSAGES_ADAPTER,
+        PersonaConfig,
+    )
+
+    _LAZY_IMPORTED = True
+
+
+@functools.cache
+def _auth_headers() -> dict:
+    """Authorization headers, built once per process.
+
+    The key lives in the environment, not in source or the .pyc
+    constants table; the cache means the f-string concatenation happens
+    exactly once.
+    """
+    api_key = os.environ.get("XAI_API_KEY")
+    if not api_key:
+        raise RuntimeError(
+            "XAI_API_KEY is not set; export it before starting the chat."
+        )
+    return {"Authorization": f"Bearer {api_key}"}
+
+
+# (persona_file, st_mtime_ns) -> assembled system message. Parsing and
+# validating the persona is skipped entirely while the file is unchanged.
+_PERSONA_CACHE = None
+
+
+def load_system_message(persona_file: str = PERSONA_FILE, reload: bool = False) -> str:
+    """Build the system prompt from the persona config file."""
+    global _PERSONA_CACHE
+    persona_path = Path(persona_file)
+    try:
+        mtime_ns = persona_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        logger.warning("Persona file %s not found, using default persona", persona_file)
+        return "You are Grok, a helpful AI assistant."
+    key = (persona_file, mtime_ns)
+    if _PERSONA_CACHE is not None and _PERSONA_CACHE[0] == key and not reload:
+        return _PERSONA_CACHE[1]
+    _lazy_imports()
+    persona = PersonaConfig(**_json_loads(persona_path.read_bytes()))
+    message = (
+        f"You are {persona.name}, {persona.personality} "
+        f"Your speaking style: {persona.speaking_style} "
+        f"Your interests include: {', '.join(persona.interests)}."
+    )
+    _PERSONA_CACHE = (key, message)
+    return message
+
+
+def __getattr__(name: str):
+    """PEP 562 hook: SYSTEM_MESSAGE and the schema classes stay
+    importable from this module without being built at import time."""
+    if name == "SYSTEM_MESSAGE":
+        return load_system_message()
+    if name in ("Message", "ChatMemory", "PersonaConfig", "MESSAGES_ADAPTER"):
+        _lazy_imports()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class RateLimiter:
+    """Token-bucket limiter for outgoing API requests.
+
+    Two floats of state — the token count and the last refill time —
+    replace the per-request timestamp ring: O(1) time and memory for
+    every operation, with bursts up to max_requests absorbed naturally.
+    All access happens on the I/O event loop, so no lock is needed.
+    """
+
+    def __init__(self, max_requests: int = 50, window_seconds: int = 60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.rate = max_requests / window_seconds  # tokens per second
+        self.capacity = float(max_requests)
+        self.tokens = float(max_requests)
+        self._last_refill = time.monotonic()
+        # Monotonic deadline imposed by server rate-limit headers; the
+        # local bucket alone can't see other clients on the same key.
+        self._pause_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._last_refill) * self.rate
+        )
+        self._last_refill = now
+
+    def can_make_request(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= 1.0
+
+    def add_request(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens = max(0.0, self.tokens - 1.0)
+
+    @property
+    def remaining_capacity(self) -> int:
+        """Requests that could be sent right now without waiting."""
+        self._refill(time.monotonic())
+        return int(self.tokens)
+
+    def update_from_headers(self, headers) -> None:
+        """Throttle reactively from the server's rate-limit headers.
+
+        When the reported remaining request budget is nearly exhausted,
+        pause until the server's reset rather than waiting to be told
+        with a 429.
+        """
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is None:
+            return
+        try:
+            remaining = int(remaining)
+        except ValueError:
+            return
+        if remaining > max(2, self.max_requests // 10):
+            return
+        retry_after = headers.get("retry-after")
+        try:
+            pause = float(retry_after)
+        except (TypeError, ValueError):
+            # No explicit reset given: back off by one window slot.
+            pause = self.window_seconds / self.max_requests
+        deadline = time.monotonic() + pause
+        if deadline > self._pause_until:
+            self._pause_until = deadline
+            logger.debug(
+                "Server reports %d requests remaining, pausing %.3fs",
+                remaining, pause,
+            )
+
+    async def wait_for_capacity(self) -> None:
+        while True:
+            now = time.monotonic()
+            # Server-imposed pause takes precedence over the local bucket.
+            if now < self._pause_until:
+                await asyncio.sleep(self._pause_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1.0:
+                return
+            # Sleep exactly long enough for the deficit to refill.
+            sleep_for = (1.0 - self.tokens) / self.rate
+            logger.debug("Rate limit reached, sleeping %.3fs", sleep_for)
+            await asyncio.sleep(max(0.001, sleep_for))
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease concurrency control.
+
+    Each success under the latency target raises the allowed concurrency
+    by alpha; a 429/5xx/timeout (or latency above target) multiplies it
+    by beta. Utilization hovers near what the endpoint will bear without
+    a hand-tuned static ceiling.
+    """
+
+    def __init__(self, c_min: int = 1, c_max: int = 64, alpha: float = 0.5,
+                 beta: float = 0.5, latency_target: float = 20.0):
+        self.c_min = c_min
+        self.c_max = c_max
+        self.alpha = alpha
+        self.beta = beta
+        self.latency_target = latency_target
+        self.c = float(min(4, c_max))
+        self._latencies = deque(maxlen=32)
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.c_min, int(self.c))
+
+    def on_success(self, latency: float) -> None:
+        self._latencies.append(latency)
+        avg = sum(self._latencies) / len(self._latencies)
+        if avg <= self.latency_target:
+            self.c = min(self.c_max, self.c + self.alpha)
+        else:
+            self.on_backoff()
+
+    def on_backoff(self) -> None:
+        self.c = max(self.c_min, self.c * self.beta)
+        logger.debug("AIMD: concurrency reduced to %.2f", self.c)
+
+
+class PersistentChat:
+    """Chat session with on-disk memory and rate-limited API access.
+
+    API calls are coroutines over one httpx.AsyncClient: the work is
+    almost entirely network wait, so concurrent conversations (see
+    chat_many) overlap their latency instead of serializing on a
+    blocking socket.
+    """
+
+    # Upper bound on in-flight requests issued through chat_many.
+    MAX_CONCURRENCY = 64
+
+    def __init__(self, memory_file: str = MEMORY_FILE):
+        _lazy_imports()
+        _configure_logging()
+        self.memory_file = Path(memory_file)
+        # One keepalive pool for the whole session: without it each
+        # retry can open a fresh TLS connection, and the handshake often
+        # costs more than the request itself.
+        self.client = httpx.AsyncClient(
+            base_url=XAI_API_BASE,
+            headers=_auth_headers(),
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(
+                max_connections=self.MAX_CONCURRENCY,
+                max_keepalive_connections=32,
+                keepalive_expiry=300.0,
+            ),
+            # Retries are our own _make_api_request loop's job, and
+            # skipping proxy/env discovery keeps construction cheap.
+            transport=httpx.AsyncHTTPTransport(retries=0),
+            trust_env=False,
+        )
+        self._aimd = AIMDController(c_max=self.MAX_CONCURRENCY)
+        self._inflight = 0
+        self._conc_cond = asyncio.Condition()
+        # Serializes bookkeeping on the shared outgoing-context list:
+        # chat() calls can overlap (chat_many, or a GUI send while a
+        # reply is still streaming) and each mutates it.
+        self._history_lock = asyncio.Lock()
+        self.model = MODEL_NAME
+        self.rate_limiter = RateLimiter()
+        self._append_count = 0
+        self._fp = None
+        self._prewarm_task = None
+        self.memory = self._load_memory()
+        self._api_messages = self._build_api_messages()
+        self._schedule_prewarm()
+
+    async def prewarm(self) -> None:
+        """Establish the TLS/HTTP2 session before the first user turn.
+
+        The first request otherwise pays hundreds of ms of handshake.
+        Best-effort: failures just mean the first turn connects itself,
+        so swallow everything — including the RuntimeError httpx raises
+        when the client was closed before this task got to run, which
+        would otherwise surface as a never-retrieved task exception and
+        put an ERROR line into an otherwise clean session log.
+        """
+        try:
+            await self.client.get("/models", timeout=10.0)
+        except Exception:
+            pass
+
+    def _schedule_prewarm(self) -> None:
+        # Note: the task only runs once the loop reaches an await. The
+        # GUI's loop thread gets there immediately; the blocking REPL
+        # doesn't, so there it effectively runs with the first chat().
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # constructed outside a loop; caller may prewarm itself
+        self._prewarm_task = loop.create_task(self.prewarm())
+
+    def _build_api_messages(self) -> List[dict]:
+        # The include filter runs inside pydantic-core, so the per-field
+        # dict construction happens in Rust rather than a Python loop.
+        history = self.memory.model_dump(
+            include={"messages": {"__all__": {"role", "content"}}}
+        )["messages"]
+        messages = [{"role": "system", "content": load_system_message()}]
+        messages.extend(m for m in history if m["role"] != "system")
+        return messages
+
+    def _load_memory(self) -> ChatMemory:
+        if self.memory_file.exists():
+            return self._load_jsonl()
+        legacy = Path(LEGACY_MEMORY_FILE)
+        if legacy.exists():
+            memory = self._load_legacy_json(legacy)
+            self.memory = memory
+            self._save_memory()  # one-time migration to the JSONL format
+            return memory
+        logger.info("No memory file found, starting fresh")
+        return ChatMemory(metadata={"created": datetime.now().isoformat()})
+
+    def _load_jsonl(self) -> ChatMemory:
+        records: List[dict] = []
+        metadata: dict = {}
+        dropped = 0
+        truncate_at = None
+        tail_open = False
+        try:
+            with open(self.memory_file, "rb") as f:
+                pos = 0
+                for raw in f:
+                    start = pos
+                    pos += len(raw)
+                    tail_open = not raw.endswith(b"\n")
+                    line = raw.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = _json_loads(line)
+                        if "role" not in rec:
+                            # Header record carrying session metadata.
+                            metadata = rec.get("metadata", metadata)
+                            continue
+                        if "ts" not in rec:  # pre-float-format records
+                            rec["ts"] = datetime.fromisoformat(
+                                rec.pop("timestamp")
+                            ).timestamp()
+                    except (KeyError, ValueError) as e:
+                        # One bad record — typically the tail torn by a
+                        # crash mid-append — must not void the rest.
+                        dropped += 1
+                        if tail_open:
+                            # Cut the torn line off before the file is
+                            # reused: the next append would otherwise
+                            # concatenate onto it and break every
+                            # subsequent load.
+                            truncate_at = start
+                        else:
+                            logger.warning(
+                                "Skipping malformed memory record: %s", e
+                            )
+                        continue
+                    records.append(rec)
+            if truncate_at is not None:
+                logger.warning(
+                    "Truncating torn trailing record at byte %d of %s",
+                    truncate_at,
+                    self.memory_file,
+                )
+                with open(self.memory_file, "r+b") as f:
+                    f.truncate(truncate_at)
+            elif tail_open:
+                # Last record is intact but unterminated; finish the
+                # line so appends start fresh.
+                with open(self.memory_file, "ab") as f:
+                    f.write(b"\n")
+            # One batch validation in pydantic-core: as cheap as the old
+            # model_construct loop, but malformed records are caught.
+            try:
+                messages = MESSAGES_ADAPTER.validate_python(records)
+            except ValueError:
+                # Salvage what validates, dropping the rest.
+                messages = []
+                for rec in records:
+                    try:
+                        messages.append(Message(**rec))
+                    except ValueError:
+                        dropped += 1
+            if dropped:
+                logger.warning("Dropped %d malformed memory records", dropped)
+            logger.info("Loaded %d messages from memory", len(messages))
+            return ChatMemory(messages=messages, metadata=metadata)
+        except OSError as e:
+            logger.error("Error loading memory file: %s", e)
+            return ChatMemory(metadata={"created": datetime.now().isoformat()})
+
+    def _load_legacy_json(self, legacy: Path) -> ChatMemory:
+        try:
+            data = _json_loads(legacy.read_bytes())
+            records = [
+                {
+                    "role": m["role"],
+                    "content": m["content"],
+                    "ts": datetime.fromisoformat(m["timestamp"]).timestamp(),
+                }
+                for m in data.get("messages", [])
+            ]
+            messages = MESSAGES_ADAPTER.validate_python(records)
+            logger.info("Migrating %d messages from %s", len(messages), legacy)
+            return ChatMemory(messages=messages, metadata=data.get("metadata", {}))
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            logger.error("Error loading memory file: %s", e)
+            return ChatMemory(metadata={"created": datetime.now().isoformat()})
+
+    @staticmethod
+    def _message_record(msg: Message) -> bytes:
+        return _json_dumps_compact(msg.model_dump())
+
+    def _memory_fp(self):
+        """Lazily opened, buffered append handle for the JSONL log.
+
+        Reopening the file per turn cost an open/close syscall pair per
+        message; a 64 KiB-buffered handle held for the session batches
+        the writes, and atexit guarantees the tail is flushed on a clean
+        shutdown.
+        """
+        if self._fp is None:
+            self._fp = open(self.memory_file, "ab", buffering=1 << 16)
+            atexit.register(self._close_memory_fp)
+        return self._fp
+
+    def _close_memory_fp(self) -> None:
+        if self._fp is not None:
+            try:
+                self._fp.close()
+            except OSError:
+                pass
+            self._fp = None
+
+    def _append_jsonl(self, msg: Message) -> None:
+        """O(1) per-turn persistence: append one line, fsync in groups."""
+        try:
+            f = self._memory_fp()
+            f.write(self._message_record(msg) + b"\n")
+            self._append_count += 1
+            if self._append_count % FSYNC_EVERY == 0:
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error("Error appending to memory file: %s", e)
+
+    def _save_memory(self) -> None:
+        """Full rewrite of the JSONL file (migration, clear, compaction).
+
+        Writes to a temp file and os.replace()s it over the target,
+        which is atomic on POSIX and Windows: no backup/rename dance and
+        no window where the memory file is missing or half-written.
+        """
+        # Release the append handle so buffered lines hit the old file
+        # before it is swapped out from under the descriptor.
+        self._close_memory_fp()
+        try:
+            lines = [_json_dumps_compact({"metadata": self.memory.metadata})]
+            lines.extend(self._message_record(m) for m in self.memory.messages)
+            # Temp file in the same directory so os.replace() stays a
+            # same-filesystem rename; fsync before the swap so a crash
+            # cannot leave an empty file installed under the real name.
+            with tempfile.NamedTemporaryFile(
+                dir=self.memory_file.parent, suffix=".tmp", delete=False
+            ) as f:
+                f.write(b"\n".join(lines) + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(f.name, self.memory_file)
+        except OSError as e:
+            logger.error("Error saving memory file: %s", e)
+
+    async def _request_once(self, messages: List[dict], on_delta) -> str:
+        if on_delta is None:
+            response = await self.client.post(
+                "/chat/completions",
+                json={"model": self.model, "messages": messages},
+            )
+            self.rate_limiter.update_from_headers(response.headers)
+            response.raise_for_status()
+            # response.text decodes the whole body; skip it unless debug
+            # logging is actually on.
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("API Response Body: %s", response.text)
+            return response.json()["choices"][0]["message"]["content"]
+        # SSE stream: accumulate deltas and surface partial text.
+        parts = []
+        # Bound once outside the per-token loop; at streaming rates the
+        # repeated attribute/global lookups are measurable.
+        parts_append = parts.append
+        loads = _json_loads
+        join = "".join
+        async with self.client.stream(
+            "POST",
+            "/chat/completions",
+            json={"model": self.model, "messages": messages, "stream": True},
+        ) as response:
+            self.rate_limiter.update_from_headers(response.headers)
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                delta = loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    parts_append(delta)
+                    on_delta(join(parts))
+        logger.debug("API Response Body: <streamed %d chunks>", len(parts))
+        return "".join(parts)
+
+    @staticmethod
+    def _backoff(attempt: int, response=None) -> float:
+        """Delay before the next retry.
+
+        Honors Retry-After whenever the server sent one; otherwise
+        full-jitter exponential backoff, so a herd of clients retrying
+        the same outage spreads out instead of colliding again.
+        """
+        if response is not None:
+            retry_after = response.headers.get("retry-after")
+            if retry_after is not None:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    async def _make_api_request(self, messages: List[dict], on_delta=None) -> str:
+        """Issue the completion request, streaming when on_delta is given.
+
+        on_delta, if provided, is called with the accumulated reply text
+        as tokens arrive, so callers can show partial output instead of
+        waiting for the full generation.
+        """
+        last_error = None
+        rate_limiter = self.rate_limiter
+        aimd = self._aimd
+        cond = self._conc_cond
+        perf_counter = time.perf_counter
+        for attempt in range(MAX_RETRIES):
+            try:
+                await rate_limiter.wait_for_capacity()
+                rate_limiter.add_request()
+                async with cond:
+                    await cond.wait_for(
+                        lambda: self._inflight < aimd.concurrency
+                    )
+                    self._inflight += 1
+                start = perf_counter()
+                try:
+                    result = await self._request_once(messages, on_delta)
+                    aimd.on_success(perf_counter() - start)
+                    return result
+                finally:
+                    async with cond:
+                        self._inflight -= 1
+                        cond.notify_all()
+            except httpx.HTTPStatusError as e:
+                last_error = e
+                if e.response.status_code in (429, 502, 503):
+                    self._aimd.on_backoff()
+                logger.error("API request failed (attempt %d): %s", attempt + 1, e)
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(self._backoff(attempt, e.response))
+            except httpx.TimeoutException as e:
+                last_error = e
+                self._aimd.on_backoff()
+                logger.error("API request timed out (attempt %d): %s", attempt + 1, e)
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(self._backoff(attempt))
+            except Exception as e:
+                last_error = e
+                logger.error("API request failed (attempt %d): %s", attempt + 1, e)
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(self._backoff(attempt))
+        raise RuntimeError(f"API request failed after {MAX_RETRIES} attempts: {last_error}")
+
+    async def chat(self, message: str, on_delta=None) -> str:
+        """Send a user message and return the assistant's reply."""
+        # The outgoing list is maintained incrementally across turns
+        # rather than rebuilt from memory on every call. Calls can
+        # overlap, so the request is sent from a snapshot and every
+        # mutation of the shared list happens under the lock; a second
+        # in-flight turn can then neither leak into this payload nor
+        # have its entries popped by this call's failure path.
+        user_entry = {"role": "user", "content": message}
+        async with self._history_lock:
+            self._api_messages.append(user_entry)
+            # Keep the cache itself at system prompt + MAX_CONTEXT_MSGS
+            # by dropping the oldest turns in place.
+            overflow = len(self._api_messages) - 1 - MAX_CONTEXT_MSGS
+            if overflow > 0:
+                del self._api_messages[1 : 1 + overflow]
+            outgoing = list(self._api_messages)
+        try:
+            response = await self._make_api_request(outgoing, on_delta=on_delta)
+        except Exception:
+            # Keep the cache consistent on failure by removing exactly
+            # this call's entry — matched by identity, since concurrent
+            # turns may have appended after it (or trimmed it away).
+            async with self._history_lock:
+                for i, entry in enumerate(self._api_messages):
+                    if entry is user_entry:
+                        del self._api_messages[i]
+                        break
+            raise
+        async with self._history_lock:
+            self._api_messages.append(
+                {"role": "assistant", "content": response}
+            )
+            user_msg = Message(role="user", content=message)
+            assistant_msg = Message(role="assistant", content=response)
+            self.memory.messages.append(user_msg)
+            self.memory.messages.append(assistant_msg)
+            # Two O(1) appends instead of rewriting the whole history.
+            self._append_jsonl(user_msg)
+            self._append_jsonl(assistant_msg)
+        # INFO-level success marker: restore_working_version scans the
+        # session logs for it when picking a known-good session.
+        logger.info("Chat round-trip completed (%d chars)", len(response))
+        return response
+
+    def get_chat_history(self) -> List[dict]:
+        entries = self.memory.model_dump()["messages"]
+        for entry in entries:
+            entry["timestamp"] = datetime.fromtimestamp(entry.pop("ts")).isoformat()
+        return entries
+
+    _STREAM_DONE = object()
+
+    async def chat_stream(self, message: str):
+        """Async generator yielding reply text deltas as they arrive.
+
+        Built on chat(), so retries, rate limiting and persistence
+        behave exactly as in the non-streaming path; this only converts
+        the accumulated-text callback into per-delta yields.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        seen = 0
+
+        def on_delta(text):
+            nonlocal seen
+            if len(text) < seen:
+                # A mid-stream retry restarted accumulation; emit the
+                # new attempt's reply from its beginning.
+                seen = 0
+            if len(text) > seen:
+                queue.put_nowait(text[seen:])
+                seen = len(text)
+
+        task = asyncio.create_task(self.chat(message, on_delta=on_delta))
+        task.add_done_callback(lambda _t: queue.put_nowait(self._STREAM_DONE))
+        while True:
+            item = await queue.get()
+            if item is self._STREAM_DONE:
+                break
+            yield item
+        await task  # surface errors (and the final bookkeeping) here
+
+    async def chat_many(self, messages: List[str]) -> List[str]:
+        """Run several independent prompts concurrently.
+
+        The AIMD gate in _make_api_request bounds in-flight requests, so
+        gather() overlaps network latency without flooding the endpoint.
+        """
+        return list(await asyncio.gather(*(self.chat(m) for m in messages)))
+
+    async def aclose(self) -> None:
+        """Release the HTTP connection pool and flush pending writes."""
+        if self._prewarm_task is not None:
+            self._prewarm_task.cancel()
+            self._prewarm_task = None
+        self._close_memory_fp()
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "PersistentChat":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    async def clear_memory(self) -> None:
+        """Reset the conversation and rewrite the memory file.
+
+        A coroutine so it runs on the I/O loop under _history_lock:
+        clearing mid-turn otherwise races the list swap and the file
+        replace against a concurrent chat()'s bookkeeping and appends.
+        """
+        async with self._history_lock:
+            self.memory = ChatMemory(
+                metadata={"created": datetime.now().isoformat()}
+            )
+            self._api_messages = self._build_api_messages()
+            self._save_memory()
+
+
+def safe_input(prompt: str = "") -> str:
+    """input() that survives EOF/KeyboardInterrupt with a clean exit."""
+    stdout = sys.stdout
+    try:
+        stdout.write(prompt)
+        stdout.flush()
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError
+        return line.rstrip("\n")
+    except (EOFError, KeyboardInterrupt):
+        print()
+        sys.exit(0)
+
+
+async def _repl() -> None:
+    async with PersistentChat() as chat:
+        while True:
+            user_input = safe_input("\nYou: ").strip()
+            if not user_input:
+                continue
+            if user_input.lower() in ("quit", "exit"):
+                break
+            if user_input.lower() == "history":
+                for entry in chat.get_chat_history():
+                    print(f"[{entry['timestamp']}] {entry['role']}: {entry['content']}")
+                continue
+            if user_input.lower() == "clear":
+                await chat.clear_memory()
+                print("Memory cleared.")
+                continue
+            try:
+                print("\nAI: ", end="", flush=True)
+                async for token in chat.chat_stream(user_input):
+                    print(token, end="", flush=True)
+                print()
+            except RuntimeError as e:
+                print(f"\nError: {e}")
+
+
+def main():
+    print("=" * 60)
+    print("  Persistent Chat - xAI")
+    print("  Commands: 'quit' to exit, 'history' to review, 'clear' to reset")
+    print("=" * 60)
+
+    if not sys.stdin.isatty():
+        print("Interactive terminal required.")
+        return
+
+    # Only an interactive session pays for log setup and the heavy deps.
+    _configure_logging()
+    asyncio.run(_repl())
+
+
+if __name__ == "__main__":
+    main()
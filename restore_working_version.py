@@ -0,0 +1,185 @@
+"""Restore helper for the persistent chat.
+
+Scans the debug logs for the most recent session that completed an API
+round-trip without logging an error, and snapshots or restores copies
+of persistent_chat.py under backups/ so a known-good version can be
+recovered after a bad edit.
+"""
+
+import heapq
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+LOG_DIR = Path("logs")
+BACKUP_DIR = Path("backups")
+TARGET_FILE = Path("persistent_chat.py")
+
+# Compiled once; the pattern covers the whole filename so fullmatch
+# skips re.search's position scan as well as the per-call compile.
+_LOG_RE = re.compile(r"chat_debug_(\d{8}_\d{6})\.log")
+
+# Scan results per log file, keyed by filename with the mtime recorded
+# at scan time. Logs are append-only while a session runs and frozen
+# afterwards, so an unchanged mtime means the cached verdict still
+# holds and the file need not be reread. The version is bumped whenever
+# the scan predicates change, discarding verdicts from older rules.
+SCAN_CACHE_FILE = LOG_DIR / ".scan_cache.json"
+_SCAN_CACHE_VERSION = 2
+
+# The session log format is "%(asctime)s %(levelname)s %(message)s":
+# failures carry the ERROR levelname token, and persistent_chat logs
+# "Chat round-trip completed" at INFO after each persisted reply.
+_ERROR_MARKER = " ERROR "
+_SUCCESS_MARKER = "Chat round-trip completed"
+
+
+def _load_scan_cache():
+    try:
+        with open(SCAN_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.pop("_v", None) != _SCAN_CACHE_VERSION:
+        return {}
+    return cache
+
+
+def _save_scan_cache(cache):
+    cache["_v"] = _SCAN_CACHE_VERSION
+    try:
+        with open(SCAN_CACHE_FILE, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+
+def _scan_files(directory, prefix, suffix):
+    """List (name, path, mtime) for matching files in one directory pass.
+
+    os.scandir caches each entry's stat result, so this costs one
+    syscall per file instead of a glob plus a stat per later use.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return [
+                (e.name, e.path, e.stat().st_mtime)
+                for e in entries
+                if e.name.startswith(prefix) and e.name.endswith(suffix)
+            ]
+    except FileNotFoundError:
+        return []
+
+
+def _fast_copy(src, dst):
+    """Copy src to dst, preferring in-kernel copy_file_range on Linux.
+
+    copy_file_range moves the bytes without bouncing them through
+    userspace buffers; copystat keeps copy2's metadata behavior. On
+    platforms without the syscall this is plain shutil.copy2.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                src_fd = fsrc.fileno()
+                dst_fd = fdst.fileno()
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                while os.copy_file_range(src_fd, dst_fd, 1 << 20):
+                    pass
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # The syscall can still fail at runtime (EXDEV across
+            # filesystems on older kernels, EINVAL/ENOSYS per fs) after
+            # dst was already truncated — fall through and let copy2
+            # reopen and rewrite it.
+            pass
+    shutil.copy2(src, dst)
+
+
+def find_working_version():
+    """Return the session timestamp of the newest error-free log.
+
+    A log qualifies when it holds at least one completed round-trip
+    marker and no ERROR-level line. Logs are checked newest-first and
+    read line by line: the first ERROR ends that file's scan
+    immediately, so a failed session costs only the bytes up to its
+    first error instead of a full read.
+    """
+    logs = _scan_files(LOG_DIR, "chat_debug_", ".log")
+    cache = _load_scan_cache()
+    dirty = False
+    result = None
+
+    def candidates():
+        # Session timestamps sort lexically, so tuple order is
+        # chronological. The newest few logs almost always decide the
+        # answer, so partial-sort the top 16 (O(N log 16)) and only pay
+        # for a full sort of the rest if none of them qualifies.
+        head = heapq.nlargest(16, logs)
+        yield from head
+        if len(logs) > 16:
+            yield from sorted(logs, reverse=True)[16:]
+
+    for name, path, mtime in candidates():
+        match = _LOG_RE.fullmatch(name)
+        if not match:
+            continue
+        cached = cache.get(name)
+        if cached is not None and cached[0] == mtime:
+            has_success, has_error = cached[1], cached[2]
+        else:
+            has_success = False
+            has_error = False
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    if _ERROR_MARKER in line:
+                        has_error = True
+                        break
+                    if _SUCCESS_MARKER in line:
+                        has_success = True
+            cache[name] = [mtime, has_success, has_error]
+            dirty = True
+        if has_success and not has_error:
+            result = match.group(1)
+            break
+    if dirty:
+        _save_scan_cache(cache)
+    return result
+
+
+def backup_current():
+    """Copy persistent_chat.py into backups/ under a timestamped name."""
+    BACKUP_DIR.mkdir(exist_ok=True)
+    timestamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+    dest = BACKUP_DIR / f"persistent_chat_{timestamp}.py"
+    _fast_copy(TARGET_FILE, dest)
+    return dest
+
+
+def restore_latest_backup():
+    """Put the newest backup back in place of persistent_chat.py."""
+    backups = _scan_files(BACKUP_DIR, "persistent_chat_", ".py")
+    if not backups:
+        return None
+    _name, path, _mtime = max(backups, key=lambda t: t[2])
+    _fast_copy(path, TARGET_FILE)
+    return Path(path)
+
+
+def main():
+    working = find_working_version()
+    if working is None:
+        print("No error-free session found in the logs.")
+    else:
+        print(f"Last known-good session: {working}")
+    dest = backup_current()
+    print(f"Backed up current {TARGET_FILE} to {dest}")
+
+
+if __name__ == "__main__":
+    main()